@@ -6,13 +6,27 @@ Usage:
 If output_file is omitted, the diagram is printed to stdout.
 """
 import csv
+import io
 import logging
 import os
+import re
 import sys
-from typing import List, Tuple, Optional, Dict
+from typing import Iterable, Iterator, List, Tuple, Optional, Dict
 from collections import defaultdict
+from itertools import chain
 import argparse
 
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
+
+_HOST_RE = re.compile(r"p-([a-z]+)-([a-z]+)(\d+)", re.IGNORECASE)
+# Union of the hostname pattern (anchored) and the sys/idx label checks, so a
+# single C-level scan classifies a node. Case-sensitive: callers match it
+# against an already-lowercased hostname.
+_CLASSIFY_RE = re.compile(r"^p-([a-z]+)-([a-z]+)(\d+)|(sys)|(idx)")
+
 
 def setup_logging() -> None:
     """Set up logging configuration."""
@@ -22,34 +36,57 @@ def setup_logging() -> None:
     )
 
 
-def read_flows(csv_path: str) -> List[Tuple[str, str]]:
+def iter_flows(csv_path: str, chunk_size: int = 100_000) -> Iterator[Tuple[str, str]]:
     """
-    Read flows from a CSV file with 'from' and 'to' columns.
+    Stream flows from a CSV file with 'from' and 'to' columns.
 
     Args:
         csv_path (str): Path to the CSV file.
+        chunk_size (int): Rows per pandas chunk; bounds peak memory on huge files.
 
-    Returns:
-        List[Tuple[str, str]]: List of (from, to) node pairs.
+    Yields:
+        Tuple[str, str]: unique (from, to) node pairs, in first-seen order.
     """
-    flows: List[Tuple[str, str]] = []
     try:
-        with open(csv_path, newline='', encoding='utf-8') as csvfile:
-            reader = csv.DictReader(csvfile)
+        seen: set[Tuple[str, str]] = set()
+        if pd is not None:
+            # pandas' C parser runs the inner byte loop outside CPython; fixed-size
+            # chunks keep memory bounded regardless of file size
+            for chunk in pd.read_csv(csv_path, usecols=['from', 'to'], dtype=str,
+                                     engine='c', na_filter=False, chunksize=chunk_size):
+                # Cheap in-chunk dedup in C first, then the cross-chunk set guard
+                chunk = chunk.drop_duplicates()
+                for pair in zip(chunk['from'].tolist(), chunk['to'].tolist()):
+                    if pair in seen:
+                        continue
+                    seen.add(pair)
+                    yield pair
+            return
+        # 1 MiB read buffer: far fewer read() syscalls than the default on multi-MB CSVs
+        with open(csv_path, newline='', encoding='utf-8', buffering=1 << 20) as csvfile:
+            reader = csv.reader(csvfile)
+            header = next(reader, None)
+            if header is None:
+                return
+            # Resolve column positions once instead of a dict lookup per row
+            i_from = header.index('from')
+            i_to = header.index('to')
+            min_len = max(i_from, i_to) + 1
             for row in reader:
-                from_node = row.get('from')
-                to_node = row.get('to')
-                if from_node is None or to_node is None:
+                if len(row) < min_len:
                     logging.warning(f"Skipping row with missing data: {row}")
                     continue
-                flows.append((from_node, to_node))
+                pair = (row[i_from], row[i_to])
+                if pair in seen:
+                    continue
+                seen.add(pair)
+                yield pair
     except FileNotFoundError:
         logging.error(f"File not found: {csv_path}")
         sys.exit(1)
     except Exception as e:
         logging.error(f"Error reading CSV: {e}")
         sys.exit(1)
-    return flows
 
 
 def parse_hostname(hostname: str) -> Optional[Tuple[str, str, str]]:
@@ -62,33 +99,33 @@ def parse_hostname(hostname: str) -> Optional[Tuple[str, str, str]]:
     Returns:
         Optional[Tuple[str, str, str]]: (data_center, function, serial) or None if not matching.
     """
-    import re
-    match = re.match(r"p-([a-z]+)-([a-z]+)(\d+)", hostname, re.IGNORECASE)
-    if match:
-        data_center, function, serial = match.groups()
-        return data_center, function, serial
-    return None
+    match = _HOST_RE.match(hostname)
+    return match.groups() if match else None
 
 
-def summarize_hosts(nodes: set[str], function_map: Dict[str, str]) -> Dict[str, Dict[str, list[str]]]:
+def summarize_hosts(nodes: Iterable[str], function_map: Dict[str, str], parsed_cache: Dict[str, Optional[Tuple[str, str, str]]]) -> Tuple[Dict[str, Dict[str, list[str]]], Dict[str, str]]:
     """
-    Group hostnames by function and data center.
+    Group hostnames by function and data center, preserving the given node order.
 
     Args:
-        nodes (set[str]): Set of node names.
+        nodes (Iterable[str]): Node names; buckets keep this iteration order.
         function_map (Dict[str, str]): Mapping of function codes to human-readable names.
+        parsed_cache (Dict[str, Optional[Tuple[str, str, str]]]): Pre-parsed hostname results per node.
 
     Returns:
-        Dict[str, Dict[str, list[str]]]: {function: {data_center: [hostnames]}}
+        Tuple[Dict[str, Dict[str, list[str]]], Dict[str, str]]:
+            ({function: {data_center: [hostnames]}}, {function label: raw function code})
     """
     summary: Dict[str, Dict[str, list[str]]] = defaultdict(lambda: defaultdict(list))
+    func_code_of: Dict[str, str] = {}
     for node in nodes:
-        parsed = parse_hostname(node)
+        parsed = parsed_cache[node]
         if parsed:
             data_center, function, _ = parsed
             function_label = function_map.get(function, function)
+            func_code_of[function_label] = function
             summary[function_label][data_center].append(node)
-    return summary
+    return summary, func_code_of
 
 
 def print_summary_table(summary: Dict[str, Dict[str, list[str]]]) -> None:
@@ -107,85 +144,138 @@ def print_summary_table(summary: Dict[str, Dict[str, list[str]]]) -> None:
     print()
 
 
-def generate_mermaid(flows: List[Tuple[str, str]], collapse_threshold: int = 5) -> str:
+def _render_flat(sorted_nodes: list[str], edges: List[Tuple[str, str]], label_cache: Dict[str, str]) -> str:
+    """
+    Render a plain flowchart with no subgraphs or collapsing.
+
+    Fast path for inputs where no hostname matches the P-xxx-yyyzzz pattern,
+    so there is no function/data-center layout to build.
+
+    Args:
+        sorted_nodes (list[str]): All node names in output order.
+        edges (List[Tuple[str, str]]): Deduplicated (from, to) pairs.
+        label_cache (Dict[str, str]): Display label per node.
+
+    Returns:
+        str: Mermaid diagram as a string.
+    """
+    buf = io.StringIO()
+    buf.write("flowchart TD")
+    for node in sorted_nodes:
+        buf.write(f'\n    "{node}"["{label_cache[node]}"]')
+    buf_write = buf.write
+    edge_fmt = '\n    "{}" --> "{}"'.format
+    for from_node, to_node in edges:
+        if from_node == to_node:
+            continue
+        buf_write(edge_fmt(from_node, to_node))
+    return buf.getvalue()
+
+
+def generate_mermaid(flows: Iterable[Tuple[str, str]], collapse_threshold: int = 5) -> str:
     """
-    Generate a Mermaid flowchart from a list of flows, grouping servers in subgraphs by function and data center.
+    Generate a Mermaid flowchart from an iterable of flows, grouping servers in subgraphs by function and data center.
     If the number of nodes of any type in a data center is greater than collapse_threshold, collapse them into a single node labeled with the function.
     Hostnames of the form P-xxx-yyyzzz are parsed for function and data center.
     Function codes (e.g., 'sys', 'idx') are mapped to human-readable names.
 
     Args:
-        flows (List[Tuple[str, str]]): List of (from, to) node pairs.
+        flows (Iterable[Tuple[str, str]]): Iterable of (from, to) node pairs, consumed once.
         collapse_threshold (int): Number of nodes above which to collapse into one node.
 
     Returns:
-        str: Mermaid diagram as a string.
+        str: Mermaid diagram as a string, empty if no flows were found.
     """
     function_map = {
         'sysk': 'Syslog koncernet',
         'idx': 'Indexer',
     }
-    nodes = set()
-    for from_node, to_node in flows:
-        nodes.add(from_node)
-        nodes.add(to_node)
-    # Group nodes by function and data center
-    summary = summarize_hosts(nodes, function_map)
+    # Consume the flow stream once; the set constructor flattens the pairs in C
+    edges: List[Tuple[str, str]] = list(flows)
+    if not edges:
+        return ''
+    # Sort once globally; every bucket built from this order is already sorted
+    sorted_nodes = sorted(set(chain.from_iterable(edges)))
+    # Single fused pass over the nodes: one regex scan per node classifies it,
+    # and the same iteration fills the grouping, the unmatched list, and the
+    # fallback labels. No later stage touches a node twice.
+    summary: Dict[str, Dict[str, list[str]]] = defaultdict(lambda: defaultdict(list))
+    func_code_of: Dict[str, str] = {}
+    label_cache: Dict[str, str] = {}
+    unmatched: list[str] = []
+    fmap_get = function_map.get
+    for node in sorted_nodes:
+        # Lower once per node; the case-sensitive pattern avoids the
+        # per-character case folding of an IGNORECASE match
+        m = _CLASSIFY_RE.search(node.lower())
+        if m is not None and m.group(1) is not None:
+            data_center, function = m.group(1), m.group(2)
+            function_label = fmap_get(function, function)
+            func_code_of[function_label] = function
+            summary[function_label][data_center].append(node)
+            continue
+        unmatched.append(node)
+        if m is None:
+            label_cache[node] = f'{node} host'
+        elif m.group(4) is not None:
+            label_cache[node] = f'{node} Syslog'
+        else:
+            label_cache[node] = f'{node} indexer'
+    # No datacenter layout at all: skip the collapse/subgraph machinery entirely
+    if not summary:
+        return _render_flat(sorted_nodes, edges, label_cache)
     # Add grouping for 'host' nodes (not matching pattern)
-    host_group: Dict[str, list[str]] = defaultdict(list)
-    for node in nodes:
-        if not parse_hostname(node):
-            host_group['host'].append(node)
-    if host_group:
-        summary['host'] = host_group
+    if unmatched:
+        summary['host'] = {'host': unmatched}
     # Track collapsed nodes
-    collapsed_nodes = set()
-    collapsed_map = {}  # node -> collapsed node name
-    lines = ["flowchart TD"]
+    collapsed_map = {}  # node -> collapsed node name; membership doubles as "is collapsed?"
+    buf = io.StringIO()
+    buf.write("flowchart TD")
     # Create subgraphs for each function and data center
     for function, dc_dict in summary.items():
+        # Resolve the human-readable suffix once per function, not once per host
+        func_code = func_code_of.get(function)
+        func_suffix = function_map.get(func_code) if func_code is not None else None
         for data_center, hosts in dc_dict.items():
             subgraph_label = f"{function} - {data_center}"
             if len(hosts) > collapse_threshold:
                 # Collapse nodes into one
                 collapsed_node = f"{function}_{data_center}".replace(' ', '_')
                 collapsed_label = f"{function.capitalize()} ({data_center})"
-                lines.append(f'    "{collapsed_node}"["{collapsed_label}"]')
+                buf.write(f'\n    "{collapsed_node}"["{collapsed_label}"]')
                 for node in hosts:
-                    collapsed_nodes.add(node)
                     collapsed_map[node] = collapsed_node
             else:
-                lines.append(f"    subgraph {subgraph_label}")
-                for node in sorted(hosts):
-                    label = node
-                    parsed = parse_hostname(node)
-                    if parsed:
-                        _, func, _ = parsed
-                        if func in function_map:
-                            label = f'{node} {function_map[func]}'
-                    else:
-                        node_lower = node.lower()
-                        if 'sys' in node_lower:
-                            label = f'{node} Syslog'
-                        elif 'idx' in node_lower:
-                            label = f'{node} indexer'
-                        else:
-                            label = f'{node} host'
-                    lines.append(f'        "{node}"["{label}"]')
-                lines.append("    end")
-    # Then define edges, redirecting to collapsed nodes if needed
-    edge_set = set()
-    for from_node, to_node in flows:
-        from_actual = collapsed_map.get(from_node, from_node)
-        to_actual = collapsed_map.get(to_node, to_node)
+                # One join + one write per subgraph instead of a write per host
+                if func_code is None:
+                    host_lines = (f'\n        "{n}"["{label_cache[n]}"]' for n in hosts)
+                elif func_suffix:
+                    host_lines = (f'\n        "{n}"["{n} {func_suffix}"]' for n in hosts)
+                else:
+                    host_lines = (f'\n        "{n}"["{n}"]' for n in hosts)
+                buf.write(f"\n    subgraph {subgraph_label}{''.join(host_lines)}\n    end")
+    # Then define edges, redirecting to collapsed nodes if needed.
+    # Bind the per-iteration lookups to locals; attribute resolution in this
+    # loop is measurable on large edge lists.
+    edge_set: set[Tuple[str, str]] = set()
+    cmap_get = collapsed_map.get
+    eset_add = edge_set.add
+    buf_write = buf.write
+    edge_fmt = '\n    "{}" --> "{}"'.format
+    seen = 0
+    for from_node, to_node in edges:
+        from_actual = cmap_get(from_node, from_node)
+        to_actual = cmap_get(to_node, to_node)
         # Avoid self-loops for collapsed nodes
         if from_actual == to_actual:
             continue
-        edge = (from_actual, to_actual)
-        if edge not in edge_set:
-            lines.append(f'    "{from_actual}" --> "{to_actual}"')
-            edge_set.add(edge)
-    return '\n'.join(lines)
+        # Check-and-insert with a single hash: the set only grows on new edges
+        eset_add((from_actual, to_actual))
+        if len(edge_set) == seen:
+            continue
+        seen += 1
+        buf_write(edge_fmt(from_actual, to_actual))
+    return buf.getvalue()
 
 
 def print_usage() -> None:
@@ -235,26 +325,30 @@ def main() -> None:
 
     logging.info(f"Reading flows from: {input_csv}")
     try:
-        # Check if file is empty before reading
-        if not os.path.isfile(input_csv) or os.path.getsize(input_csv) == 0:
+        # One stat call answers both "does it exist?" and "is it empty?"
+        try:
+            st = os.stat(input_csv)
+        except OSError:
+            st = None
+        if st is None or st.st_size == 0:
             print_usage()
             logging.error("Input file is empty or does not exist.")
             sys.exit(1)
-        flows = read_flows(input_csv)
+        flows = iter_flows(input_csv)
     except Exception as e:
         print_usage()
         logging.error(f"Error reading input file: {e}")
         sys.exit(1)
-    if not flows:
+
+    mermaid_diagram = generate_mermaid(flows, collapse_threshold=collapse_threshold)
+    if not mermaid_diagram:
         print_usage()
         logging.error("No flows found in the input file.")
         sys.exit(1)
 
-    mermaid_diagram = generate_mermaid(flows, collapse_threshold=collapse_threshold)
-
     if output_file:
         try:
-            with open(output_file, 'w', encoding='utf-8') as f:
+            with open(output_file, 'w', encoding='utf-8', buffering=1 << 20) as f:
                 f.write(mermaid_diagram)
             logging.info(f"Mermaid diagram written to {output_file}")
         except Exception as e:
@@ -262,7 +356,10 @@ def main() -> None:
             logging.error(f"Failed to write output file: {e}")
             sys.exit(1)
     else:
-        print(mermaid_diagram)
+        # Single write + flush instead of print: avoids line-buffered flushing when piped
+        sys.stdout.write(mermaid_diagram)
+        sys.stdout.write('\n')
+        sys.stdout.flush()
 
 
 if __name__ == "__main__":